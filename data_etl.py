@@ -1,22 +1,88 @@
+import os
 import pandas as pd
 import numpy as np
 import geopandas as gpd
+import pyarrow as pa
+import pyarrow.csv
+import shapely
+import sqlite3
 import unicodedata
 
 from tqdm import tqdm
 from glob import glob
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 
 from utils import constants
 
 
-def load_data(input_pattern="data/external/*.xlsx"):
+def _process_file(file_path, start_date=None, end_date=None):
+    """
+    Processa um único arquivo Excel, retornando as planilhas válidas como DataFrames.
+
+    Função de módulo (e não closure) para poder ser executada em processos
+    filhos pelo `ProcessPoolExecutor` de `load_data`. Se `start_date`/`end_date`
+    forem informados, cada planilha já é filtrada pelo período, reduzindo o
+    volume de dados que chega às etapas seguintes do ETL.
+
+    Args:
+        file_path (str): Caminho do arquivo Excel a ser processado.
+        start_date (str, optional): Data de início do filtro (formato 'YYYY-MM-DD').
+        end_date (str, optional): Data de fim do filtro (formato 'YYYY-MM-DD').
+
+    Returns:
+        list[pd.DataFrame]: As planilhas processadas do arquivo.
+    """
+    processed_sheets = []
+    try:
+        excel_file = pd.ExcelFile(file_path, engine="calamine")
+        valid_sheets = [s for s in excel_file.sheet_names
+                          if s.upper() not in constants.excluded_sheets]
+
+        for sheet_name in valid_sheets:
+            keyword = next((kw for kw in constants.sheet_config
+                               if kw in sheet_name.upper()), None)
+
+            if not keyword:
+                print(f"\nIgnorando planilha: '{sheet_name}' no arquivo '{file_path}' (tipo não mapeado).")
+                continue
+
+            print(f"\nProcessando arquivo: '{file_path}', planilha: '{sheet_name}'")
+            df_sheet = excel_file.parse(sheet_name)
+
+            if start_date and end_date:
+                df_sheet = df_sheet[(df_sheet["DATA_OCORRENCIA_BO"] >= start_date)
+                                    & (df_sheet["DATA_OCORRENCIA_BO"] <= end_date)]
+
+            tipo, descr_col = constants.sheet_config[keyword]
+            df_sheet["TIPO"] = tipo
+            df_sheet["DESCR_TIPO"] = df_sheet[descr_col]
+
+            processed_sheets.append(df_sheet)
+
+    except Exception as e:
+        print(f"\nErro ao processar o arquivo '{file_path}': {e}")
+
+    return processed_sheets
+
+
+def load_data(input_pattern="data/external/*.xlsx", start_date=None, end_date=None):
     """
     Carrega, processa e consolida dados de múltiplos arquivos e planilhas Excel.
 
+    Os arquivos são independentes entre si e o custo é dominado por
+    descompressão + parsing, então cada um é processado em um processo
+    separado, usando todos os núcleos disponíveis. O filtro de período é
+    aplicado ainda na leitura de cada planilha, para que as etapas seguintes
+    só processem as linhas de interesse.
+
     Args:
-        str: Padrão de busca para os arquivos Excel de entrada.
+        input_pattern (str): Padrão de busca para os arquivos Excel de entrada.
+        start_date (str, optional): Data de início do filtro (formato 'YYYY-MM-DD').
+        end_date (str, optional): Data de fim do filtro (formato 'YYYY-MM-DD').
     """
     print("Iniciando o carregamento dos dados...")
 
@@ -25,34 +91,12 @@ def load_data(input_pattern="data/external/*.xlsx"):
         print(f"\nNenhum arquivo encontrado com o padrão: {input_pattern}")
         return
 
-
     processed_sheets = []
-    for file_path in excel_files:
-        try:
-            excel_file = pd.ExcelFile(file_path)
-            valid_sheets = [s for s in excel_file.sheet_names 
-                              if s.upper() not in constants.excluded_sheets]
-
-            for sheet_name in valid_sheets:
-                keyword = next((kw for kw in constants.sheet_config 
-                                   if kw in sheet_name.upper()), None)
-
-                if not keyword:
-                    print(f"\nIgnorando planilha: '{sheet_name}' no arquivo '{file_path}' (tipo não mapeado).")
-                    continue
-
-                print(f"\nProcessando arquivo: '{file_path}', planilha: '{sheet_name}'")
-                df_sheet = excel_file.parse(sheet_name)
-                
-                tipo, descr_col = constants.sheet_config[keyword]
-                df_sheet["TIPO"] = tipo
-                df_sheet["DESCR_TIPO"] = df_sheet[descr_col]
-                
-                processed_sheets.append(df_sheet)
-
-        except Exception as e:
-            print(f"\nErro ao processar o arquivo '{file_path}': {e}")
-            continue
+    process_file = partial(_process_file, start_date=start_date, end_date=end_date)
+    with ProcessPoolExecutor(max_workers=min(len(excel_files), os.cpu_count() or 1),
+                             mp_context=get_context("spawn")) as executor:
+        for file_sheets in executor.map(process_file, excel_files):
+            processed_sheets.extend(file_sheets)
 
     if not processed_sheets:
         print("Nenhuma planilha válida foi processada. Saindo.")
@@ -60,68 +104,119 @@ def load_data(input_pattern="data/external/*.xlsx"):
 
     df = pd.concat(processed_sheets, ignore_index=True)
 
+    # Colunas de baixa cardinalidade: como 'category', o groupby/merge opera
+    # sobre códigos inteiros em vez de re-hashear as strings linha a linha.
+    for col in ["TIPO", "DESCR_TIPO", "NOME_DELEGACIA", "CIDADE", "BAIRRO"]:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
     return df
 
 
-def prepare_data(data, start_date, end_date):
+def prepare_data(data):
     """
-    Prepara e limpa os dados de ocorrências, aplicando agregações, normalizações e filtros.
+    Prepara e limpa os dados de ocorrências, aplicando agregações e normalizações.
+
+    O filtro de período já é aplicado em `load_data`, na leitura das planilhas.
 
     Args:
         data (pd.DataFrame): O DataFrame bruto de entrada.
-        start_date (str): A data de início do filtro (formato 'YYYY-MM-DD').
-        end_date (str): A data de fim do filtro (formato 'YYYY-MM-DD').
 
     Returns:
         pd.DataFrame: O DataFrame processado e pronto para análise.
     """
     grouping_keys = ["NOME_DELEGACIA", "ANO_BO", "NUM_BO", "TIPO", "DESCR_TIPO"]
-    agg_cols = {
-        "DATA_OCORRENCIA_BO": "first", "CIDADE": "first", "BAIRRO": "first",
-        "LOGRADOURO": "first", "NUMERO_LOGRADOURO": "first", "DESCR_MARCA_VEICULO": "first",
-        "DESCR_OCORRENCIA_VEICULO": "first", "LATITUDE": "first", "LONGITUDE": "first"
-    }
-
-    df = data.groupby(grouping_keys, as_index=False).agg(agg_cols)
+    kept_cols = [
+        "DATA_OCORRENCIA_BO", "CIDADE", "BAIRRO",
+        "LOGRADOURO", "NUMERO_LOGRADOURO", "DESCR_MARCA_VEICULO",
+        "DESCR_OCORRENCIA_VEICULO", "LATITUDE", "LONGITUDE"
+    ]
+
+    # Como toda agregação era "first", deduplicar pelas chaves é equivalente
+    # ao groupby/agg e evita a construção dos grupos.
+    df = data.drop_duplicates(subset=grouping_keys, keep="first")[grouping_keys + kept_cols].copy()
     df.columns = df.columns.str.lower()
 
-    df = df[(df["data_ocorrencia_bo"] >= start_date) & (df["data_ocorrencia_bo"] <= end_date)]
+    # Coordenadas zeradas significam "sem localização": uma única passada
+    # vetorizada sobre as duas colunas as converte para NaN.
+    latlon = df[["latitude", "longitude"]].to_numpy(dtype="float64")
+    latlon[latlon == 0] = np.nan
+    df[["latitude", "longitude"]] = latlon
 
-    df.loc[df["latitude"] == 0, "latitude"] = None
-    df.loc[df["longitude"] == 0, "longitude"] = None
+    numero = df["numero_logradouro"]
+    df["numero_logradouro"] = np.where(numero.isna() | (numero == 0),
+                                       "S/N",
+                                       numero.astype("Int64").astype(str))
 
-    df["numero_logradouro"] = (
-        df["numero_logradouro"].fillna(-99)
-                               .astype(int)
-                               .replace(-99, "S/N")
-    )
-
-    df["norm_cidade"] = df["cidade"].apply(normalize_text)
+    df["norm_cidade"] = normalize_series(df["cidade"])
     df["norm_cidade"] = df["norm_cidade"].str.replace("S.", "SAO ")
-    df['norm_cidade'] = df['norm_cidade'].replace(constants.adjusted_region_names)
-
-    logradouro_str = df['logradouro'].astype(str)
-    numero_str     = df['numero_logradouro'].astype(str)
-    bairro_str     = df['bairro'].astype(str)
-    cidade_str     = df['norm_cidade'].astype(str)
-
-    df["endereco_completo"] = (
-        logradouro_str + ", " +
-        numero_str + ", " +
-        bairro_str + ", " +
-        cidade_str + " - SP"
+
+    # Como categórico, o ajuste de nomes percorre só as ~centenas de categorias,
+    # não as N linhas. `rename_categories` não serve aqui: o nome corrigido
+    # (ex.: 'SANTO ANDRE') geralmente já existe como categoria.
+    df["norm_cidade"] = df["norm_cidade"].astype("category")
+    df["norm_cidade"] = df["norm_cidade"].map(lambda cidade: constants.adjusted_region_names.get(cidade, cidade))
+
+    df["endereco_completo"] = np.array(
+        [f"{logradouro}, {numero}, {bairro}, {cidade} - SP"
+         for logradouro, numero, bairro, cidade in zip(df["logradouro"].to_numpy(),
+                                                       df["numero_logradouro"].to_numpy(),
+                                                       df["bairro"].to_numpy(),
+                                                       df["norm_cidade"].to_numpy())],
+        dtype=object
     )
 
-    df["endereco_completo"] = df["endereco_completo"].str.replace("VEDAÇÃO DA DIVULGAÇÃO DOS DADOS RELATIVOS,", "", regex=False)
-    df["endereco_completo"] = df["endereco_completo"].str.replace("S/N,", "", regex=False)
-    df[["latitude", "longitude"]] = df[["latitude", "longitude"]].replace(0, np.nan)
+    df["endereco_completo"] = df["endereco_completo"].str.replace(
+        r"(VEDAÇÃO DA DIVULGAÇÃO DOS DADOS RELATIVOS,|S/N,)", "", regex=True
+    )
+    df["norm_cidade"] = df["norm_cidade"].astype("category")
 
     return df
 
 
+def load_population_estimate(input_path="data/external/estimativa_dou_2025.xls",
+                             cache_path="data/processed/estimativa_sp.parquet"):
+    """
+    Carrega a estimativa populacional dos municípios de SP já limpa.
+
+    A estimativa é um dado de referência estático: o resultado limpo é salvo em
+    Parquet e reutilizado nas execuções seguintes enquanto o xls não mudar,
+    evitando o parsing do Excel a cada rodada.
+
+    Args:
+        input_path (str): Caminho do xls de estimativa populacional do IBGE.
+        cache_path (str): Caminho do cache Parquet com os dados já limpos.
+
+    Returns:
+        pd.DataFrame: Um DataFrame com as colunas 'cod_municipio', 'norm_cidade'
+                      e 'populacao_estimada'.
+    """
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(input_path):
+        estimativa_populacional = pd.read_parquet(cache_path)
+        estimativa_populacional["norm_cidade"] = estimativa_populacional["norm_cidade"].astype("category")
+    else:
+        estimativa_populacional = pd.read_excel(input_path,
+                                                sheet_name="Municípios",
+                                                dtype={"COD. MUNIC": str},
+                                                skiprows=1,
+                                                usecols=["UF", "COD. MUNIC", "NOME DO MUNICÍPIO", "POPULAÇÃO ESTIMADA"],
+                                                engine="calamine")
+        estimativa_populacional = estimativa_populacional.dropna()
+
+        # Filtra SP antes de normalizar: reduz de ~5500 municípios do país para ~645.
+        estimativa_populacional = estimativa_populacional[estimativa_populacional["UF"] == "SP"]
+        estimativa_populacional["norm_cidade"] = normalize_series(estimativa_populacional["NOME DO MUNICÍPIO"]).astype("category")
+        estimativa_populacional = estimativa_populacional.rename(columns={"POPULAÇÃO ESTIMADA": "populacao_estimada",
+                                                                        "COD. MUNIC": "cod_municipio"})
+        estimativa_populacional = estimativa_populacional[["cod_municipio", "norm_cidade", "populacao_estimada"]]
+        estimativa_populacional.to_parquet(cache_path, index=False)
+
+    return estimativa_populacional
+
+
 def get_population_estimate(df):
     """
-    Carrega dados de estimativa populacional e os adiciona a um DataFrame existente.
+    Adiciona a estimativa populacional de SP a um DataFrame existente.
 
     Args:
         df (pd.DataFrame): O DataFrame principal ao qual os dados de população serão adicionados.
@@ -129,24 +224,24 @@ def get_population_estimate(df):
     Returns:
         pd.DataFrame: O DataFrame original com a coluna 'populacao_estimada' adicionada.
     """
-    estimativa_populacional = pd.read_excel("data/external/estimativa_dou_2025.xls", 
-                                            sheet_name="Municípios", 
-                                            dtype={"COD. MUNIC": str},
-                                            skiprows=1)
-    estimativa_populacional = estimativa_populacional.dropna()
-
-    estimativa_populacional["norm_cidade"] = estimativa_populacional["NOME DO MUNICÍPIO"].apply(normalize_text)
-    estimativa_populacional = estimativa_populacional[estimativa_populacional["UF"] == "SP"]
-    estimativa_populacional = estimativa_populacional.rename(columns={"POPULAÇÃO ESTIMADA": "populacao_estimada",
-                                                                    "COD. MUNIC": "cod_municipio"})
-    
-    estimativa_populacional = df.merge(estimativa_populacional[["cod_municipio", "norm_cidade", "populacao_estimada"]], 
-                                       on="norm_cidade", 
-                                       how="left")
-    
-    # Mantém apenas os municípios de SP
-    estimativa_populacional = estimativa_populacional.dropna(subset=["cod_municipio"])
-    
+    estimativa_populacional = load_population_estimate()
+
+    # Com as duas chaves no mesmo dtype categórico, o merge compara códigos
+    # inteiros em vez de re-hashear as strings dos municípios.
+    cidades_dtype = pd.CategoricalDtype(
+        df["norm_cidade"].cat.categories.union(estimativa_populacional["norm_cidade"].cat.categories)
+    )
+    estimativa_populacional["norm_cidade"] = estimativa_populacional["norm_cidade"].astype(cidades_dtype)
+
+    estimativa_populacional = df.assign(norm_cidade=df["norm_cidade"].astype(cidades_dtype)) \
+                                .merge(estimativa_populacional,
+                                       on="norm_cidade",
+                                       how="left",
+                                       validate="many_to_one")
+
+    # Linhas sem correspondência ficam com cod_municipio nulo: elas ainda podem
+    # ser resolvidas espacialmente (fill_municipality_from_coords) após a
+    # geocodificação, e só então são descartadas.
     return estimativa_populacional
 
 
@@ -156,6 +251,9 @@ def save_shapefile_sp(input_path="data/external/shape_sp/SP_Municipios_2024.shp"
     Lê um shapefile de municípios, filtra para o estado de São Paulo (SP),
     ajusta o código do município e salva o resultado como um GeoJSON.
 
+    O GeoJSON gerado é reaproveitado nas execuções seguintes enquanto o
+    shapefile de origem não mudar, evitando o reprocessamento.
+
     Args:
         input_path (str): O caminho para o shapefile de entrada.
         output_path (str): O caminho para o arquivo GeoJSON de saída.
@@ -163,63 +261,206 @@ def save_shapefile_sp(input_path="data/external/shape_sp/SP_Municipios_2024.shp"
     Returns:
         gpd.GeoDataFrame: O GeoDataFrame processado.
     """
-    geo_sp = gpd.read_file(input_path)
+    if os.path.exists(output_path) and os.path.getmtime(output_path) >= os.path.getmtime(input_path):
+        return gpd.read_file(output_path, engine="pyogrio", use_arrow=True)
+
+    geo_sp = gpd.read_file(input_path, engine="pyogrio", use_arrow=True)
 
     geo_sp = geo_sp[geo_sp["CD_UF"] == "35"]
     geo_sp["CD_MUN"] = geo_sp["CD_MUN"].astype(str).str[2:]
 
-    geo_sp.to_file(output_path, driver="GeoJSON")
+    geo_sp.to_file(output_path, driver="GeoJSON", engine="pyogrio")
 
     return geo_sp
 
 
-def get_geolocation(df):
+def load_geocache(cache_path="data/processed/geocache.sqlite"):
+    """
+    Carrega o cache persistente de geocodificação em um dicionário.
+
+    Cria o banco SQLite (e a tabela) caso ainda não exista, para que execuções
+    repetidas do ETL reaproveitem endereços já resolvidos pelo Nominatim.
+
+    Args:
+        cache_path (str): Caminho do arquivo SQLite de cache.
+
+    Returns:
+        tuple: A conexão SQLite aberta e o dicionário {endereco: (lat, lon)}.
+    """
+    conn = sqlite3.connect(cache_path)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocache (address TEXT PRIMARY KEY, lat REAL, lon REAL)"
+    )
+    cache = {addr: (lat, lon) for addr, lat, lon in conn.execute("SELECT address, lat, lon FROM geocache")}
+
+    return conn, cache
+
+
+def save_geocache(conn, new_entries):
+    """
+    Persiste em lote os endereços geocodificados nesta execução.
+
+    Args:
+        conn (sqlite3.Connection): Conexão aberta com o banco de cache.
+        new_entries (dict): Mapeamento {endereco: (lat, lon)} a ser gravado.
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO geocache (address, lat, lon) VALUES (?, ?, ?)",
+        [(addr, lat, lon) for addr, (lat, lon) in new_entries.items()]
+    )
+    conn.commit()
+
+
+def fill_municipality_from_coords(df, geo_sp):
+    """
+    Preenche 'cod_municipio' ausente a partir das coordenadas das ocorrências.
+
+    Constrói um índice espacial (`shapely.STRtree`) sobre os polígonos dos
+    municípios e consulta todos os pontos de uma vez, em vez de testar
+    `geometry.contains` linha a linha (O(N·M)). Linhas sem coordenadas ou com
+    código já preenchido não são tocadas.
+
+    Args:
+        df (pd.DataFrame): DataFrame com as colunas 'cod_municipio', 'latitude' e 'longitude'.
+        geo_sp (gpd.GeoDataFrame): Municípios de SP com as colunas 'CD_MUN' e 'geometry'.
+
+    Returns:
+        pd.DataFrame: O DataFrame com os códigos de município preenchidos.
+    """
+    mask = df["cod_municipio"].isna() & df["latitude"].notna() & df["longitude"].notna()
+    if not mask.any():
+        return df
+
+    points = shapely.points(df.loc[mask, "longitude"].to_numpy(dtype="float64"),
+                            df.loc[mask, "latitude"].to_numpy(dtype="float64"))
+    tree = shapely.STRtree(geo_sp.geometry.values)
+    point_idx, poly_idx = tree.query(points, predicate="within")
+
+    cod_municipio = df["cod_municipio"].astype(object)
+    cod_municipio.loc[df.index[mask][point_idx]] = geo_sp["CD_MUN"].to_numpy()[poly_idx]
+    df["cod_municipio"] = cod_municipio.astype("category")
+
+    return df
+
+
+def get_geolocation(df, domain=None, scheme="https"):
     """
     Preenche coordenadas de latitude e longitude ausentes em um DataFrame.
 
     A função identifica endereços únicos sem coordenadas, busca-os usando a API do Nominatim
     de forma otimizada (sem duplicatas e com limite de requisições), e atualiza o DataFrame original.
+    Os resultados são guardados em um cache SQLite em disco, de modo que execuções
+    repetidas só consultem a API para endereços ainda não resolvidos.
+
+    Uma instância própria do Nominatim (ex.: via Docker) pode ser usada informando
+    `domain`; nesse caso o limite de 1 requisição/segundo da API pública não se
+    aplica e o intervalo entre chamadas é removido.
 
     Args:
         df (pd.DataFrame): DataFrame contendo as colunas 'endereco_completo', 'latitude' e 'longitude'.
+        domain (str, optional): Domínio de uma instância própria do Nominatim
+                                (ex.: 'localhost:8080'). Se None, usa a API pública.
+        scheme (str): Esquema HTTP usado com `domain` ('http' ou 'https').
 
     Returns:
         pd.DataFrame: O DataFrame com as coordenadas preenchidas.
     """
-    
-    geolocator = Nominatim(user_agent="app_v1", timeout=10)
-    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, return_value_on_exception=None)
 
-    tqdm.pandas(desc="Geocodificando endereços")
+    if domain:
+        geolocator = Nominatim(user_agent="app_v1", timeout=10, domain=domain, scheme=scheme)
+        min_delay_seconds = 0
+    else:
+        geolocator = Nominatim(user_agent="app_v1", timeout=10)
+        min_delay_seconds = 1
+
+    geocode = RateLimiter(geolocator.geocode, min_delay_seconds=min_delay_seconds,
+                          return_value_on_exception=None)
+
+    conn, cache = load_geocache()
+    new_entries = {}
+
+    def cached_geocode(address):
+        if address in cache:
+            return cache[address]
+
+        location = geocode(address)
+        coords = (getattr(location, "latitude", None), getattr(location, "longitude", None))
+        cache[address] = coords
+
+        # Falhas (timeout, endereço não encontrado) ficam só no memo da execução
+        # atual; não são persistidas, para que a próxima rodada tente de novo.
+        if coords[0] is not None and coords[1] is not None:
+            new_entries[address] = coords
+
+        return coords
 
     nodup_location = (
         df.drop_duplicates(subset=["endereco_completo"])
         .loc[lambda df: df["latitude"].isna() | df["longitude"].isna()]
     )
 
-    nodup_location = (
-        nodup_location
-        .assign(geo_coord=nodup_location["endereco_completo"].progress_apply(geocode))
-        .assign(
-            latitude_coord=lambda df: df["geo_coord"].apply(lambda loc: getattr(loc, "latitude", None)),
-            longitude_coord=lambda df: df["geo_coord"].apply(lambda loc: getattr(loc, "longitude", None))
-        )
-        [["endereco_completo", "latitude_coord", "longitude_coord"]]
-    )
+    geo_coords = {endereco: cached_geocode(endereco)
+                  for endereco in tqdm(nodup_location["endereco_completo"],
+                                       desc="Geocodificando endereços")}
+
+    save_geocache(conn, new_entries)
+    conn.close()
+
+    # O resultado é um dicionário endereço -> (lat, lon): um .map direto
+    # substitui o merge + fillna + drop, sem construir frame intermediário.
+    lat_map = {endereco: lat for endereco, (lat, _) in geo_coords.items()}
+    lon_map = {endereco: lon for endereco, (_, lon) in geo_coords.items()}
 
-    locations = (
-        df
-        .merge(nodup_location, on="endereco_completo", how="left")
-        .assign(
-            latitude=lambda df: df["latitude"].fillna(df["latitude_coord"]),
-            longitude=lambda df: df["longitude"].fillna(df["longitude_coord"])
-        )
-        .drop(columns=["latitude_coord", "longitude_coord"])
+    locations = df.assign(
+        latitude=df["latitude"].combine_first(df["endereco_completo"].map(lat_map)),
+        longitude=df["longitude"].combine_first(df["endereco_completo"].map(lon_map))
     )
 
     return locations
 
 
+def normalize_series(series):
+    """Normaliza uma Series de strings de forma vetorizada.
+
+    Aplica as mesmas transformações de `normalize_text` (remoção de acentos,
+    maiúsculas e normalização de espaços), mas usando os métodos `.str` do
+    pandas, que percorrem a coluna em código C em vez de chamar uma função
+    Python por linha. Como as colunas de cidade têm poucos valores distintos
+    (SP tem ~645 municípios), a normalização é calculada apenas sobre os
+    valores únicos e mapeada de volta para as N linhas. A decomposição NFKD
+    (a parte cara, em Python puro) só roda nos valores que de fato contêm
+    caracteres não-ASCII.
+
+    Args:
+        series (pd.Series): A Series de strings a ser normalizada.
+
+    Returns:
+        pd.Series: A Series normalizada.
+    """
+    uniques = pd.Series(series.dropna().unique()).astype(object)
+
+    ascii_mask = uniques.map(lambda valor: isinstance(valor, str) and valor.isascii())
+    cleaned = uniques.copy()
+    cleaned[~ascii_mask] = (
+        uniques[~ascii_mask].str.normalize("NFKD")
+                            .str.encode("ascii", "ignore")
+                            .str.decode("ascii")
+    )
+
+    normalized = (
+        cleaned.str.upper()
+               .str.replace(r"\s+", " ", regex=True)
+               .str.strip()
+    )
+    mapping = dict(zip(uniques, normalized))
+
+    # `astype(object)` garante que o resultado não herde dtype categórico da
+    # entrada: um map sobre categórico devolve categórico quando os nomes
+    # normalizados são todos distintos, e o fillna("") abaixo falharia por
+    # "" não ser uma categoria.
+    return series.astype(object).map(mapping).fillna("")
+
+
 def normalize_text(text):
     """Normaliza uma única string.
 
@@ -249,27 +490,45 @@ def normalize_text(text):
 
 if __name__ == "__main__":
     print("Iniciando o processo de ETL...\n")
-    df = load_data()
+    df = load_data(start_date="2025-01-01", end_date="2025-06-30")
 
     print("\nPreparando os dados...")
-    df = prepare_data(df, "2025-01-01", "2025-06-30")
+    df = prepare_data(df)
 
     print("\nAdicionando estimativas populacionais...")
     df = get_population_estimate(df)
 
     print("\nSalvando shapefile de SP...")
     geo_sp = save_shapefile_sp()
-    df = df.merge(geo_sp[["CD_MUN", "AREA_KM2"]].rename(columns={"CD_MUN": "cod_municipio", "AREA_KM2": "area_km2"}), 
-                  on="cod_municipio", 
-                  how="left")
+    area_municipios = geo_sp[["CD_MUN", "AREA_KM2"]].rename(columns={"CD_MUN": "cod_municipio", "AREA_KM2": "area_km2"})
+    cod_dtype = pd.CategoricalDtype(pd.Index(df["cod_municipio"].dropna().unique()).union(area_municipios["cod_municipio"].unique()))
+    area_municipios["cod_municipio"] = area_municipios["cod_municipio"].astype(cod_dtype)
+    df["cod_municipio"] = df["cod_municipio"].astype(cod_dtype)
+    df = df.merge(area_municipios, on="cod_municipio", how="left", validate="many_to_one")
     
     # df.to_csv("data/raw/ocorrencias_2025_1sem.csv", index=False)
 
     print("\nPreenchendo geolocalizações ausentes...")
-    df = get_geolocation(df)
+    df = get_geolocation(df,
+                         domain=os.getenv("NOMINATIM_DOMAIN"),
+                         scheme=os.getenv("NOMINATIM_SCHEME", "http"))
+    df = fill_municipality_from_coords(df, geo_sp)
+
+    # Linhas recuperadas espacialmente ganharam cod_municipio depois dos merges
+    # de população e área: preenche as duas colunas a partir das mesmas tabelas.
+    estimativa_sp = load_population_estimate()
+    pop_map = dict(zip(estimativa_sp["cod_municipio"], estimativa_sp["populacao_estimada"]))
+    area_map = dict(zip(area_municipios["cod_municipio"], area_municipios["area_km2"]))
+    df["populacao_estimada"] = df["populacao_estimada"].combine_first(df["cod_municipio"].map(pop_map))
+    df["area_km2"] = df["area_km2"].combine_first(df["cod_municipio"].map(area_map))
+
+    # Mantém apenas os municípios de SP (descarta o que nem o nome nem as
+    # coordenadas conseguiram resolver)
+    df = df.dropna(subset=["cod_municipio"])
 
     print(f"Dados processados com sucesso. Período: {df['data_ocorrencia_bo'].min()} a {df['data_ocorrencia_bo'].max()}")
     print(f"Número total de registros: {len(df)}")
     print(f"Proporção de nulos:\n{df.isnull().sum() / len(df)}")
 
-    df[constants.needed_columns].to_csv("data/processed/ocorrencias_2025_1sem.csv", index=False)
\ No newline at end of file
+    pa.csv.write_csv(pa.Table.from_pandas(df[constants.needed_columns], preserve_index=False),
+                     "data/processed/ocorrencias_2025_1sem.csv")
\ No newline at end of file